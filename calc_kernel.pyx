@@ -0,0 +1,47 @@
+# calc_kernel.pyx
+# cython: language_level=3
+
+# Ahead-of-time compiled versions of the kernels used by `calculation_utilities`,
+# built with `python setup.py build_ext --inplace`. When this extension module
+# isn't available, `calculation_utilities` falls back on Numba, then on NumPy.
+
+# external dependencies
+cimport cython
+from libc.math cimport floor
+from libc.stdint cimport int64_t
+
+import numpy as np
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _calc_kernel(double starting_principle,
+                 double contribution_per_compounding_period,
+                 double real_return_rate,
+                 Py_ssize_t n_points,
+                 double[::1] total):
+    """Fills the preallocated `total` array in a single pass over the 
+    compounding periods (see `calculation_utilities.calc`).
+    """
+    cdef Py_ssize_t i
+    total[0] = starting_principle
+    for i in range(1, n_points):
+        total[i] = total[i-1] + contribution_per_compounding_period + real_return_rate * total[i-1]
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def _first_crossings(const double[::1] total, double k):
+    """Returns the indices at which the monotonic `total` first reaches
+    a new multiple of `k` (see `calculation_utilities.find_indices_of_multiples`).
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n_found = 0
+    indices = np.empty(total.shape[0], dtype=np.int64)
+    cdef int64_t[::1] indices_view = indices
+    cdef double next_threshold = k * (floor(total[0] / k) + 1)
+    for i in range(1, total.shape[0]):
+        if total[i] >= next_threshold:
+            indices_view[n_found] = i
+            n_found += 1
+            next_threshold = k * (floor(total[i] / k) + 1)
+    return indices[:n_found]
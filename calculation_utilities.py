@@ -1,17 +1,118 @@
 # calculation_utilities.py
 
 # standard library dependencies
-from typing import Tuple
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
 
 # external dependencies
 import numpy as np
 import pandas as pd
 
+__all__ = [
+    "CalcResult",
+    "calc",
+    "calc_df",
+    "find_indices_of_multiples",
+    "find_doubling_points",
+    "find_overtaking_point",
+    "find_points_of_interest",
+]
+
+try:
+    # kernels compiled ahead of time with Cython, if built (see calc_kernel.pyx)
+    from calc_kernel import _calc_kernel, _first_crossings
+except ImportError:
+    try:
+        # otherwise, kernels compiled by Numba when the module is imported
+        from numba import njit
+    except ImportError:
+        # otherwise, `calc` and `find_indices_of_multiples` fall back on NumPy
+        _calc_kernel = None
+        _first_crossings = None
+    else:
+        @njit(cache=True, fastmath=True)
+        def _calc_kernel(starting_principle: float,
+                         contribution_per_compounding_period: float,
+                         real_return_rate: float,
+                         n_points: int,
+                         total: np.ndarray) -> None:
+            """Fills the preallocated `total` array in a single pass over the 
+            compounding periods (see `calc`).
+            """
+            total[0] = starting_principle
+            for i in range(1, n_points):
+                total[i] = total[i-1] + contribution_per_compounding_period + real_return_rate * total[i-1]
+
+        @njit(cache=True)
+        def _first_crossings(total: np.ndarray, k: float) -> np.ndarray:
+            """Returns the indices at which the monotonic `total` first reaches
+            a new multiple of `k` (see `find_indices_of_multiples`).
+            """
+            indices = np.empty(total.shape[0], dtype=np.int64)
+            n_found = 0
+            next_threshold = k * (np.floor(total[0] / k) + 1)
+            for i in range(1, total.shape[0]):
+                if total[i] >= next_threshold:
+                    indices[n_found] = i
+                    n_found += 1
+                    next_threshold = k * (np.floor(total[i] / k) + 1)
+            return indices[:n_found]
+
+        # compiling at import time so that the first forecast isn't charged for it
+        _calc_kernel(0.0, 0.0, 0.0, 2, np.empty(2))
+        _readonly_total = np.zeros(2)
+        _readonly_total.setflags(write=False)
+        _first_crossings(_readonly_total, 1.0)
+
+# lower bounds of `calc`'s starting_principle, contribution_per_compounding_period,
+# compounding_periods_per_year, real_return_rate and num_years, respectively
+_INPUT_LOWER_BOUNDS = np.array([0.0, 0.0, 1.0, 0.0, 1.0])
+
+class CalcResult(NamedTuple):
+    """Growth curve forecast generated by `calc`; each field is a 1-D vector
+    with one value per compounding period. Only the series that can't be derived
+    from one another are stored; see `gains`, `accrued_gains` and `series` for the rest.
+    """
+    years_elapsed: np.ndarray
+    contributions: np.ndarray
+    total: np.ndarray
+
+    SERIES = ("years_elapsed", "contributions", "accrued_gains", "gains", "total")
+
+    def gains(self, real_return_rate: float) -> np.ndarray:
+        """Returns the gains accrued over interest during each compounding period,
+        given the (cleaned up) `real_return_rate` the forecast was made with.
+        """
+        gains = np.empty_like(self.total)
+        gains[0] = 0.0
+        np.multiply(self.total[:-1], real_return_rate, out=gains[1:])
+        return gains
+
+    def accrued_gains(self) -> np.ndarray:
+        """Returns the sum of all gains accrued over interest so far."""
+        # the contributions include the starting principle, so the rest is all gains;
+        # clipped at 0 since rounding can leave a tiny negative remainder at a 0 rate
+        accrued_gains = self.total - self.contributions
+        np.maximum(accrued_gains, 0, out=accrued_gains)
+        return accrued_gains
+
+    def series(self, real_return_rate: float) -> Dict[str, np.ndarray]:
+        """Returns every series of the forecast (see `calc`), keyed by name,
+        given the (cleaned up) `real_return_rate` the forecast was made with.
+        """
+        return {
+            "years_elapsed": self.years_elapsed,
+            "contributions": self.contributions,
+            "accrued_gains": self.accrued_gains(),
+            "gains": self.gains(real_return_rate),
+            "total": self.total,
+        }
+
 def calc(starting_principle: float, 
          contribution_per_compounding_period: float,
          compounding_periods_per_year: int = 1, 
          real_return_rate: float = 0.05,
-         num_years: int = 10) -> pd.DataFrame:
+         num_years: int = 10) -> CalcResult:
     """Main function handling the generation of the compound growth forecast.
 
     Parameters
@@ -29,8 +130,8 @@ def calc(starting_principle: float,
 
     Returns
     -------
-    df : pd.DataFrame
-        Pandas DataFrame with the following columns:
+    CalcResult
+        NamedTuple giving access to the following series (see `CalcResult.series`):
             "years_elapsed",
             "contributions",
             "accrued_gains",
@@ -39,57 +140,113 @@ def calc(starting_principle: float,
         Where 
             "years_elapsed": simply denote the number of years since the start of the
                 forecasting
-            "contributions": sum of the contributions made to the savings account
+            "contributions": sum of the contributions made to the savings account,
+                including the starting principle as the initial contribution 
+                (with respect to the timeframe specified by the corresponding 
+                "years_elapsed" value); stacked with "accrued_gains", it adds
+                up to "total"
+            "accrued_gains": the sum of all gains accrued over interest so far 
                 (with respect to the timeframe specified by the corresponding 
                 "years_elapsed" value)
-            "accrued_gains": the gains accrued over interest (with respect 
-                to the timeframe specified by the corresponding "years_elapsed" value)
-            "gains": the sum of all gains accrued over interest so far 
+            "gains": the gains accrued over interest during the compounding period
                 (with respect to the timeframe specified by the corresponding 
                 "years_elapsed" value)
             "total": the total value of the savings account (with respect to the 
                 timeframe specified by the corresponding "years_elapsed" value)
         
     """
-    # cleaning up user input
-    starting_principle = max(0, starting_principle)
-    contribution_per_compounding_period = max(0, contribution_per_compounding_period)
-    compounding_periods_per_year = max(1, compounding_periods_per_year)
-    real_return_rate = max(0, real_return_rate)
-    num_years = max(1, num_years) + 1
+    # cleaning up user input in one go; `tolist` hands back plain Python floats,
+    # whichever mix of int/float/NumPy scalars the widgets provided
+    starting_principle, \
+    contribution_per_compounding_period, \
+    compounding_periods_per_year, \
+    real_return_rate, \
+    num_years = np.maximum(
+        np.array([
+            starting_principle,
+            contribution_per_compounding_period,
+            compounding_periods_per_year,
+            real_return_rate,
+            num_years
+        ], dtype=np.float64),
+        _INPUT_LOWER_BOUNDS
+    ).tolist()
     
-    n_points = int(num_years * compounding_periods_per_year)
-    contributions = np.array(
-        [starting_principle + i * contribution_per_compounding_period for i in range(n_points)],
-        dtype = float
+    return _calc_cached(
+        starting_principle,
+        contribution_per_compounding_period,
+        compounding_periods_per_year,
+        real_return_rate,
+        num_years + 1
     )
-    accrued_gains = np.zeros_like(contributions)
-    gains = np.zeros_like(contributions)
-    total = np.zeros_like(contributions)
-    
-    for i in range(n_points):
-        if i == 0:
-            total[i] = starting_principle
-            gains[i] = 0.0
-            accrued_gains[i] = 0.0
+
+@lru_cache(maxsize=128)
+def _calc_cached(starting_principle: float, 
+                 contribution_per_compounding_period: float,
+                 compounding_periods_per_year: float, 
+                 real_return_rate: float,
+                 num_years: float) -> CalcResult:
+    """Memoized implementation of `calc` for already cleaned up parameters,
+    so that callbacks fired with unchanged parameters don't recompute the forecast.
+    The returned arrays are shared between callers and are therefore read-only.
+    """
+    n_points = int(num_years * compounding_periods_per_year)
+    periods = np.arange(n_points, dtype=np.float64)
+    # the starting principle is the initial contribution, no need to special-case i == 0
+    contributions = starting_principle + periods * contribution_per_compounding_period
+
+    if _calc_kernel is not None:
+        total = np.empty(n_points)
+        _calc_kernel(
+            starting_principle,
+            contribution_per_compounding_period,
+            real_return_rate,
+            n_points,
+            total
+        )
+    else:
+        # closed form of total[i] = total[i-1] * (1 + r) + c
+        if real_return_rate == 0:
+            total = contributions.copy()
         else:
-            gain = real_return_rate * total[i-1]
-            gains[i] = gain
-            accrued_gains[i] = accrued_gains[i-1] + gain
-            total[i] = total[i-1] + contribution_per_compounding_period + gain
-    
-    df = pd.DataFrame({
-        "years_elapsed": np.arange(0, num_years, 1/compounding_periods_per_year),
-        "contributions": contributions,
-        "accrued_gains": accrued_gains,
-        "gains": gains,
-        "total": total,
-    })
+            # (1 + r) ** i as a running product: N - 1 multiplies instead of N exp/log
+            powers = np.empty(n_points)
+            powers[0] = 1.0
+            powers[1:] = 1.0 + real_return_rate
+            np.cumprod(powers, out=powers)
+            # factored so that an overflowing powers[i] yields inf rather than 0 * inf = nan
+            # when there is no starting principle
+            steady_state = contribution_per_compounding_period / real_return_rate
+            total = (starting_principle + steady_state) * powers - steady_state
     
-    return df
+    result = CalcResult(
+        years_elapsed = periods / compounding_periods_per_year,
+        contributions = contributions,
+        total = total,
+    )
+    for values in result:
+        values.setflags(write=False)
+    return result
+
+def calc_df(starting_principle: float, 
+            contribution_per_compounding_period: float,
+            compounding_periods_per_year: int = 1, 
+            real_return_rate: float = 0.05,
+            num_years: int = 10) -> pd.DataFrame:
+    """Wrapper around `calc` returning the forecast as a Pandas DataFrame
+    (one column per `CalcResult` series), for notebook/REPL use.
+    """
+    result = calc(
+        starting_principle,
+        contribution_per_compounding_period,
+        compounding_periods_per_year = compounding_periods_per_year,
+        real_return_rate = real_return_rate,
+        num_years = num_years
+    )
+    return pd.DataFrame(result.series(max(0, real_return_rate)))
   
-def find_indices_of_multiples(starting_capital: float, df: pd.DataFrame) -> np.ndarray:
-    """Returns the row indices in the provided `df` DataFrame where
+def find_indices_of_multiples(starting_capital: float, result: CalcResult) -> np.ndarray:
+    """Returns the indices in the provided `result` forecast where
     the total value of the savings account has grown to a new multiple of 
     `starting_capital`.
 
@@ -97,9 +254,8 @@ def find_indices_of_multiples(starting_capital: float, df: pd.DataFrame) -> np.n
     ----------
     starting_capital : float
         Float indicating the amount of money in the savings account at the start.
-    df : pd.DataFrame
-        Pandas DataFrame containing the data from the growth curve forecast (see
-        `calc`).
+    result : CalcResult
+        Growth curve forecast (see `calc`).
 
     Returns
     -------
@@ -107,21 +263,36 @@ def find_indices_of_multiples(starting_capital: float, df: pd.DataFrame) -> np.n
         1-D vector of integers indicating at which compounding period the total
         value of the savings account has grown to a new multiple of `starting_capital`.
     """
-    as_factor = df.total.values // starting_capital
-    return 1+np.where(as_factor[1:] != as_factor[:-1])[0]
+    if starting_capital <= 0:
+        return np.empty(0, dtype=np.int64)
+    # `total` is sorted, so when there are fewer multiples to reach than periods
+    # a binary search per multiple beats scanning the whole forecast
+    n_points = result.total.shape[0]
+    # the bounds are widened by one multiple on each side since the divisions may
+    # round differently from the comparisons made by `searchsorted`
+    first_multiple = np.floor(result.total[0] / starting_capital)
+    last_multiple = np.floor(result.total[-1] / starting_capital) + 1
+    if last_multiple - first_multiple < n_points:
+        thresholds = starting_capital * np.arange(first_multiple, last_multiple + 1)
+        indices = np.searchsorted(result.total, thresholds)
+        # index 0: the multiple was already reached at the start, not a crossing;
+        # index n_points: the multiple is never reached
+        return np.unique(indices[(indices > 0) & (indices < n_points)])
+    if _first_crossings is not None:
+        return _first_crossings(result.total, float(starting_capital))
+    return np.diff(np.floor(result.total / starting_capital)).nonzero()[0] + 1
 
-def find_doubling_points(df: pd.DataFrame,
+def find_doubling_points(result: CalcResult,
                          starting_capital: float,
-                         contribution_per_compounding_period: float) -> pd.DataFrame:
-    """Returns the rows in the provided `df` DataFrame where
+                         contribution_per_compounding_period: float) -> np.ndarray:
+    """Returns the indices in the provided `result` forecast where
     the total value of the savings account has grown to a new multiple of 
     `starting_capital`.
 
     Parameters
     ----------
-    df : pd.DataFrame
-        Pandas DataFrame containing the data from the growth curve forecast (see
-        `calc`).
+    result : CalcResult
+        Growth curve forecast (see `calc`).
     starting_principle : float 
         Float indicating the amount of money in the savings account at the start.
     contribution_per_compounding_period : float
@@ -129,50 +300,53 @@ def find_doubling_points(df: pd.DataFrame,
 
     Returns
     -------
-    pd.DataFrame
-        (Sub)DataFrame of the provided `df` DataFrame comprised only of the rows in
-        `df` representing compounding periods where the total value of the savings
-        account has reached a new multiple of `starting_principle`.
+    np.ndarray
+        1-D vector of integers indicating the compounding periods where the total 
+        value of the savings account has reached a new multiple of `starting_principle`.
     """
     starting_capital = contribution_per_compounding_period if starting_capital == 0 else starting_capital
-    doubled = find_indices_of_multiples(
-        contribution_per_compounding_period if starting_capital == 0 else starting_capital,
-        df
-    )
-    return df.iloc[doubled]
+    return find_indices_of_multiples(starting_capital, result)
 
-def find_overtaking_point(df: pd.DataFrame,
-                          contribution_per_compounding_period: float) -> pd.DataFrame:
-    """Returns a Pandas (sub)DataFrame of `df` comprised of the rows
-    for which the gains from compound interest exceed the contribution made
+def find_overtaking_point(result: CalcResult,
+                          contribution_per_compounding_period: float,
+                          real_return_rate: float) -> Optional[int]:
+    """Returns the index of the first compounding period in the provided `result` 
+    forecast for which the gains from compound interest exceed the contribution made
     on each compounding period.
 
     Parameters
     ----------
-    df : pd.DataFrame
-        Pandas DataFrame containing the data from the growth curve forecast (see
-        `calc`).
+    result : CalcResult
+        Growth curve forecast (see `calc`).
     contribution_per_compounding_period : float
         Contibutes made to the account per compounding period.
+    real_return_rate : float
+        Real Return Rate the forecast was made with.
 
     Returns
     -------
-    pd.DataFrame
-        (Sub)DataFrame of the provided `df` DataFrame comprised only of the rows in
-        `df` representing compounding periods where the gains made through compounding
-        interest have exceeded the corresponding compounding periods' contributions.
+    Optional[int]
+        Index of the first compounding period where the gains made through compounding
+        interest have exceeded the corresponding compounding period's contribution, or 
+        None if that never happens within the forecast.
     """
-    overtaking_idx = np.where(df.gains > contribution_per_compounding_period)[0]
-    if overtaking_idx.shape[0] > 0:
-        return df.iloc[overtaking_idx]
-    else:
-        return pd.DataFrame()
+    if real_return_rate <= 0:
+        return None
+    # gains[i] = real_return_rate * total[i-1] and the total never decreases, so the 
+    # first crossing can be binary-searched without materializing the gains
+    idx = 1 + int(np.searchsorted(
+        result.total, 
+        contribution_per_compounding_period / real_return_rate, 
+        side='right'
+    ))
+    return idx if idx < result.total.shape[0] else None
 
-def find_points_of_interest(df: pd.DataFrame,
+def find_points_of_interest(result: CalcResult,
                             starting_capital: float,
-                            contribution_per_compounding_period: float) -> Tuple[pd.DataFrame, pd.DataFrame]:
+                            contribution_per_compounding_period: float,
+                            real_return_rate: float) -> Tuple[np.ndarray, Optional[int]]:
     """Wrapper around `find_doubling_points` and `find_overtaking_point` 
-    that returns the Pandas (sub)DataFrames made of the rows in `df` where either
+    that returns the indices in `result` where either
 
     *   the total value of the savings account has reached a new multiple of 
         `starting_principle`, or
@@ -181,31 +355,32 @@ def find_points_of_interest(df: pd.DataFrame,
 
     Parameters
     ----------
-    df : pd.DataFrame
-        [description]
+    result : CalcResult
+        Growth curve forecast (see `calc`).
     starting_principle : float 
         Float indicating the amount of money in the savings account at the start.
     contribution_per_compounding_period : float
         Contibutes made to the account per compounding period.
+    real_return_rate : float
+        Real Return Rate the forecast was made with.
 
     Returns
     -------
-    Tuple[pd.DataFrame, pd.DataFrame]
-        (Sub)DataFrames of the provided `df` DataFrame comprised only of the rows in
-        `df` representing compounding periods where either 
-        *   (first DataFrame) the total value of the savings account has reached a new multiple of 
-            `starting_principle`, or
-        *   (second DataFrame) the gains made through compounding interest have exceeded the corresponding 
-            compounding periods' contributions
+    Tuple[np.ndarray, Optional[int]]
+        Indices of the compounding periods where either 
+        *   (first item, 1-D vector of integers) the total value of the savings account has 
+            reached a new multiple of `starting_principle`, or
+        *   (second item, integer or None) the gains made through compounding interest have 
+            first exceeded the corresponding compounding period's contribution
     """
-    doubling_points_df = find_doubling_points(
-        df,
+    doubling_idx = find_doubling_points(
+        result,
         starting_capital,
         contribution_per_compounding_period
     )
-    overtaking_point_df = find_overtaking_point(
-        df,
-        contribution_per_compounding_period
+    overtaking_idx = find_overtaking_point(
+        result,
+        contribution_per_compounding_period,
+        real_return_rate
     )
-    return doubling_points_df, overtaking_point_df
-    
\ No newline at end of file
+    return doubling_idx, overtaking_idx
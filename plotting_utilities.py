@@ -1,24 +1,205 @@
 # plotting_utilities.py
 
 # standard library dependencies
-from typing import Tuple
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+from weakref import WeakKeyDictionary
 
 # external dependencies
-from bokeh.models import HoverTool
+import numpy as np
+from bokeh.models import ColumnDataSource, HoverTool, LegendItem
 from bokeh.plotting import figure
 from bokeh.palettes import brewer
 
 import panel as pn
-pn.extension()
 
 # local dependencies
 from calculation_utilities import calc, find_points_of_interest
 
+__all__ = [
+    "CurveFigure",
+    "make_curve_figure",
+    "get_curve_figure",
+    "plot_curve",
+    "plot_curve_with_highlights",
+]
+
+# the forecast is computed (and summarized) in double precision, but single
+# precision is plenty for the arrays sent to the browser to be plotted
+_PLOT_DTYPE = np.float32
+_STACK_COLORS = brewer['Spectral'][10][3:5]
+# series read by the curve's glyphs and tooltips; the per-period gains aren't plotted
+_PLOTTED_SERIES = ("years_elapsed", "contributions", "accrued_gains", "total")
+_TOOLTIPS = [
+    ('Years Since Initial Contribution',   '@years_elapsed'),
+    ('Total Contributions',  '$@contributions'), 
+    ('Accrued Gains', '$@accrued_gains'),
+    ('Total', '$@total')
+]
+
+_SUMMARY_TEMPLATE = """## Summary
+___
+In this scenario:
+
+* you would have grown your starting capital **~{growth_factor:,}x**.
+* you would have approximately **${total:,}** after {num_years} years.
+* your accrued gains would total to roughly **${total_accrued_gains:,}**.
+{doubling_line}{overtaking_line}"""
+_DOUBLING_LINE_TEMPLATE = "* **your starting capital doubled** for the first time **after {years:,} years**."
+_OVERTAKING_LINE_TEMPLATE = "\n* the **gains realized through your {real_return_rate} real return rate** would have **surpassed your ${contribution:,} contributions** after **{years:,} years**."
+
+class CurveFigure(NamedTuple):
+    """Growth curve figure built by `make_curve_figure`, along with the sources
+    and legend items that `plot_curve` updates in place.
+    """
+    p: figure
+    source: ColumnDataSource
+    overtaking_source: ColumnDataSource
+    doubling_source: ColumnDataSource
+    overtaking_legend_item: LegendItem
+    doubling_legend_item: LegendItem
+
+# objects reused across calls to `plot_curve` and `plot_curve_with_highlights`,
+# per session (Bokeh document), then per kind of object and key
+_SESSION_OBJECTS: "WeakKeyDictionary" = WeakKeyDictionary()
+
+def _get_session_object(kind: str, key: Optional[str], factory: Callable[[], Any]) -> Any:
+    """Returns the object of the given `kind` registered under `key` for the 
+    current Panel session, creating it with `factory` on first use. A new object
+    is created on every call if `key` is None or if there is no active session
+    (e.g. in a notebook).
+    """
+    doc = pn.state.curdoc
+    if key is None or doc is None:
+        return factory()
+    session_objects = _SESSION_OBJECTS.setdefault(doc, {})
+    if (kind, key) not in session_objects:
+        session_objects[(kind, key)] = factory()
+    return session_objects[(kind, key)]
+
+def make_curve_figure() -> CurveFigure:
+    """Builds the growth curve figure with all of its glyphs, tools and styling
+    bound to empty sources (see `plot_curve`).
+
+    Returns
+    -------
+    CurveFigure
+        NamedTuple comprised of the figure, its data sources and the legend items
+        of the highlights.
+    """
+    source = ColumnDataSource({name: [] for name in _PLOTTED_SERIES})
+    overtaking_source = ColumnDataSource({'x': [], 'y2': []})
+    doubling_source = ColumnDataSource({'years_elapsed': [], 'total': []})
+
+    #curdoc().theme = 'dark_minimal'
+
+    p = figure(
+        x_range=(0, 1), 
+        y_range=(0, 1),
+        height=300
+    )
+    p.xaxis.ticker = []
+
+    v_areas = p.varea_stack(
+        stackers=['contributions', 'accrued_gains'], 
+        x='years_elapsed', 
+        color=_STACK_COLORS, 
+        legend_label=['Contributions', 'Accrued Gains'], 
+        source=source,
+        hover_alpha=0.75,
+        fill_alpha=0.5,
+        hover_color=_STACK_COLORS,
+    )
+    p.add_tools(
+        HoverTool(
+            tooltips=[],
+            mode='mouse'
+        )
+    )
+
+    total_line = p.line(
+        x='years_elapsed', 
+        y='total', 
+        line_color='red', 
+        source=source,
+        legend_label='Total Value',
+        line_width=3
+    )
+    p.add_layout(total_line)
+
+    varea = p.varea(
+        x='x',
+        y1=0, 
+        y2='y2', 
+        source=overtaking_source,
+        alpha=0.1,
+        fill_color='blue',
+        legend_label='Gains > Contribution'
+    )
+    p.add_layout(varea)
+    overtaking_legend_item = p.legend.items[-1]
+
+    factor_points = p.scatter(
+        'years_elapsed',
+        'total',
+        source=doubling_source,
+        fill_alpha=1,
+        fill_color='red',
+        line_color='white',
+        size=12,
+        marker='star',
+        legend_label='Multiple of Starting Capital'
+    )
+    p.add_layout(factor_points)      
+    doubling_legend_item = p.legend.items[-1]
+
+    # only the curve's renderers carry every series listed in the tooltips
+    p.add_tools(HoverTool(
+        tooltips=_TOOLTIPS,
+        mode='mouse',
+        renderers=v_areas + [total_line]
+    ))
+    
+    p.legend.location = "top_left"
+    p.legend.orientation = "vertical"
+    p.legend.background_fill_color = "#fafafa"
+
+    p.grid.minor_grid_line_alpha = 0
+    p.xaxis.axis_label = "Years Since Initial Contribution"
+    p.yaxis.axis_label = "Value"
+    p.toolbar.logo = None
+    p.toolbar_location = None
+    return CurveFigure(
+        p,
+        source,
+        overtaking_source,
+        doubling_source,
+        overtaking_legend_item,
+        doubling_legend_item
+    )
+
+def get_curve_figure(key: Optional[str] = None) -> CurveFigure:
+    """Returns the growth curve figure registered under `key` for the current
+    Panel session, building it on first use. A new figure is built on every call
+    if `key` is None or if there is no active session (e.g. in a notebook).
+
+    Parameters
+    ----------
+    key : Optional[str], optional
+        Name identifying the plot within the session, by default None.
+
+    Returns
+    -------
+    CurveFigure
+        See `make_curve_figure`.
+    """
+    return _get_session_object('figure', key, make_curve_figure)
+
 def plot_curve(    starting_capital: float,
                    contribution_per_compounding_period: float,
                    compounding_periods_per_year: int = 1, 
                    real_return_rate: float = 0.05,
-                   num_years: int = 10) -> Tuple[figure,int,float,float,int]:
+                   num_years: int = 10,
+                   key: Optional[str] = None) -> Tuple[figure,int,float,float,int]:
     """Utility function that handles plotting the compound growth curve
     from the specified parameters and returning the values to include
     in the highlight/milestones section (see `plot_curve_with_highlights`).
@@ -35,6 +216,9 @@ def plot_curve(    starting_capital: float,
         Expected Real Return Rate, by default 0.05.
     num_years : int, optional
         Number of years to include in the forecast, by default 10
+    key : Optional[str], optional
+        Name under which the figure is reused within the current Panel session 
+        (see `get_curve_figure`), by default None.
 
     Returns
     -------
@@ -54,7 +238,7 @@ def plot_curve(    starting_capital: float,
             The number of years after which the gains from compounding interest
             exceeds the period contributions.
     """
-    df = calc(
+    result = calc(
         starting_capital,
         contribution_per_compounding_period,
         compounding_periods_per_year = compounding_periods_per_year,
@@ -62,106 +246,76 @@ def plot_curve(    starting_capital: float,
         num_years = num_years
     )
 
-    #curdoc().theme = 'dark_minimal'
-
-    p = figure(
-        x_range=(0, df.years_elapsed.max()), 
-        y_range=(0, 1.1*df.total.max()),
-        height=300
-    )
-    p.xaxis.ticker = list(range(1, round(df.years_elapsed.max() + 1)))
-
-    v_areas = p.varea_stack(
-        stackers=['contributions', 'accrued_gains'], 
-        x='years_elapsed', 
-        color=brewer['Spectral'][10][3:5], 
-        legend_label=['Contributions', 'Accrued Gains'], 
-        source=df,
-        hover_alpha=0.75,
-        fill_alpha=0.5,
-        hover_color=brewer['Spectral'][10][3:5],
-    )
-    p.add_tools(
-        HoverTool(
-            tooltips=[],
-            mode='mouse'
-        )
-    )
+    # the rate `calc` made the forecast with
+    real_return_rate = max(0, real_return_rate)
+    # both series are sorted, so their last values are also their maximums
+    last_year = float(result.years_elapsed[-1])
+    # left as a NumPy scalar: the summary divides it by the starting capital,
+    # which yields inf rather than raising when that is 0
+    final_total = result.total[-1]
 
-    total_line = p.line(
-        x='years_elapsed', 
-        y='total', 
-        line_color='red', 
-        source=df,
-        legend_label='Total Value',
-        line_width=3
-    )
-    p.add_layout(total_line)
+    curve = get_curve_figure(key)
+    p = curve.p
+    # plain dict of arrays: Bokeh serializes them as is, no DataFrame conversion
+    # only the series in `_PLOTTED_SERIES`, so the gains are never materialized
+    plotted_series = {
+        "years_elapsed": result.years_elapsed,
+        "contributions": result.contributions,
+        "accrued_gains": result.accrued_gains(),
+        "total": result.total,
+    }
+    # values beyond single precision's range are plotted as inf
+    with np.errstate(over='ignore'):
+        curve.source.data = {
+            name: values.astype(_PLOT_DTYPE) for name, values in plotted_series.items()
+        }
+    p.x_range.end = last_year
+    p.y_range.end = 1.1*final_total
+    p.xaxis.ticker.ticks = list(range(1, round(last_year + 1)))
     
-    doubling_points_df, overtaking_points_df = find_points_of_interest(
-        df,
+    doubling_idx, overtaking_idx = find_points_of_interest(
+        result,
         starting_capital,
-        contribution_per_compounding_period
+        contribution_per_compounding_period,
+        real_return_rate
     )
-    if overtaking_points_df.shape[0] > 0:
-        first = int(overtaking_points_df.years_elapsed.values.min())
+    years_to_first_doubling = float(result.years_elapsed[doubling_idx[0]]) if doubling_idx.shape[0] > 0 else None
+    years_to_overtaking = float(result.years_elapsed[overtaking_idx]) if overtaking_idx is not None else None
+
+    # the highlights' sources are only touched when they have something to show
+    # or something to clear, sparing Bokeh a change event (and a round trip to the 
+    # browser) in the common case where there are no highlights at all
+    if years_to_overtaking is not None:
         xs = list(
-            range(first, round(df.years_elapsed.values.max())+1)
-        )
-        varea = p.varea(
-            x=xs,
-            y1=0, 
-            y2=[1.1*overtaking_points_df.total.values.max()]*len(xs), 
-            alpha=0.1,
-            fill_color='blue',
-            legend_label='Gains > Contribution'
+            range(int(years_to_overtaking), round(last_year)+1)
         )
-        p.add_layout(varea)
-        
-    if doubling_points_df.shape[0] > 0:        
-        factor_points = p.scatter(
-            'years_elapsed',
-            'total',
-            source=doubling_points_df,
-            fill_alpha=1,
-            fill_color='red',
-            line_color='white',
-            size=12,
-            marker='star',
-            legend_label='Multiple of Starting Capital'
-        )
-        p.add_layout(factor_points)      
-    
-    p.add_tools(HoverTool(
-        tooltips=[
-            ('Years Since Initial Contribution',   '@years_elapsed'),
-            ('Total Contributions',  '$@contributions'), 
-            ('Accrued Gains', '$@accrued_gains'),
-            ('Total', '$@total')
-        ],
-        mode='mouse'
-    ))
-    
-    p.legend.location = "top_left"
-    p.legend.orientation = "vertical"
-    p.legend.background_fill_color = "#fafafa"
+        curve.overtaking_source.data = {'x': xs, 'y2': [1.1*final_total]*len(xs)}
+    elif len(curve.overtaking_source.data['x']) > 0:
+        curve.overtaking_source.data = {'x': [], 'y2': []}
+    curve.overtaking_legend_item.visible = years_to_overtaking is not None
+
+    if years_to_first_doubling is not None:
+        with np.errstate(over='ignore'):
+            curve.doubling_source.data = {
+                'years_elapsed': result.years_elapsed[doubling_idx].astype(_PLOT_DTYPE),
+                'total': result.total[doubling_idx].astype(_PLOT_DTYPE)
+            }
+    elif len(curve.doubling_source.data['years_elapsed']) > 0:
+        curve.doubling_source.data = {'years_elapsed': [], 'total': []}
+    curve.doubling_legend_item.visible = years_to_first_doubling is not None
 
-    p.grid.minor_grid_line_alpha = 0
-    p.xaxis.axis_label = "Years Since Initial Contribution"
-    p.yaxis.axis_label = "Value"
-    p.toolbar.logo = None
-    p.toolbar_location = None
     return  p, \
-            doubling_points_df.years_elapsed.values[0] if doubling_points_df.shape[0] > 0 else None, \
-            df.total.values[-1], \
-            df.accrued_gains.values[-1], \
-            overtaking_points_df.years_elapsed.values[0] if overtaking_points_df.shape[0] > 0 else None
+            years_to_first_doubling, \
+            final_total, \
+            max(0.0, final_total - float(result.contributions[-1])), \
+            years_to_overtaking
 
 def plot_curve_with_highlights( starting_capital: float,
                                 contribution_per_compounding_period: float,
                                 compounding_periods_per_year: int = 1, 
                                 real_return_rate: float = 0.05,
-                                num_years: int = 10) -> pn.Column:
+                                num_years: int = 10,
+                                key: Optional[str] = None) -> pn.Column:
     """
     Wrapper around `plot_curve` to generate the growth curve plot and the
     personalized summary/milestones to go with it.
@@ -178,6 +332,9 @@ def plot_curve_with_highlights( starting_capital: float,
         Expected Real Return Rate, by default 0.05.
     num_years : int, optional
         Number of years to include in the forecast, by default 10
+    key : Optional[str], optional
+        Name under which the figure and the returned Column are reused within the 
+        current Panel session (see `get_curve_figure`), by default None.
 
     Returns
     -------
@@ -196,18 +353,31 @@ def plot_curve_with_highlights( starting_capital: float,
         compounding_periods_per_year = compounding_periods_per_year,
         real_return_rate = real_return_rate,
         num_years = num_years,
+        key = key,
+    )
+    summary = _SUMMARY_TEMPLATE.format(
+        growth_factor = round(total/starting_capital, 1),
+        total = round(total, 2),
+        num_years = num_years,
+        total_accrued_gains = round(total_accrued_gains, 2),
+        doubling_line = _DOUBLING_LINE_TEMPLATE.format(
+            years = round(years_to_first_doubling)
+        ) if years_to_first_doubling else "",
+        overtaking_line = _OVERTAKING_LINE_TEMPLATE.format(
+            real_return_rate = real_return_rate,
+            contribution = contribution_per_compounding_period,
+            years = round(years_to_overtaking)
+        ) if years_to_overtaking else "",
     )
-    summary = f"""## Summary
-___
-In this scenario:
-
-* you would have grown your starting capital **~{round(total/starting_capital, 1):,}x**.
-* you would have approximately **${round(total, 2):,}** after {num_years} years.
-* your accrued gains would total to roughly **${round(total_accrued_gains, 2):,}**.
-"""
-    if years_to_first_doubling:
-        summary += f"* **your starting capital doubled** for the first time **after {round(years_to_first_doubling):,} years**."
-    if years_to_overtaking:
-        summary += f"\n* the **gains realized through your {real_return_rate} real return rate** would have **surpassed your ${contribution_per_compounding_period:,} contributions** after **{round(years_to_overtaking):,} years**."
 
-    return pn.Column(p, summary)
+    # the Column and its panes are updated in place so that Panel only syncs
+    # what changed instead of rendering a brand new layout
+    layout = _get_session_object(
+        'layout', 
+        key, 
+        lambda: pn.Column(pn.pane.Bokeh(), pn.pane.Markdown())
+    )
+    figure_pane, summary_pane = layout
+    figure_pane.object = p
+    summary_pane.object = summary
+    return layout
@@ -0,0 +1,12 @@
+# setup.py
+# Builds the optional Cython kernels used by `calculation_utilities` with:
+#   python setup.py build_ext --inplace
+
+# external dependencies
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="growthcurveapp",
+    ext_modules=cythonize(["calc_kernel.pyx"]),
+)